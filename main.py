@@ -1,10 +1,17 @@
+import asyncio
+import errno
+import signal
 import socket
+import struct
+import sys
 import time
 from urllib.parse import urlparse
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from apscheduler.schedulers.background import BackgroundScheduler
+from collections import namedtuple
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,9 +31,98 @@ try:
         logger.error("No UDP streams found in configuration")
         exit(1)
 except (KeyError, FileNotFoundError, json.JSONDecodeError) as e:
-    logger.error(f"Failed to load configuration: {e}")
+    logger.error("Failed to load configuration: %s", e)
     exit(1)
 
+Stream = namedtuple('Stream', 'name url host port is_multicast group mreq')
+
+# check_channels reports one status code per stream
+STATUS_ACTIVE = 0
+STATUS_INACTIVE = 1
+STATUS_INVALID = 2
+STATUS_NAMES = ('ACTIVE', 'INACTIVE', 'INVALID')
+
+ERROR_NO_RESPONSE = 'No response or timeout'
+ERROR_INVALID_URL = 'Invalid URL'
+ERROR_SETUP_FAILED = 'Socket setup failed'
+ERROR_SOCKET = 'Socket error'
+
+# Keep the TLS connection to the Telegram API alive between alerts
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# Cache DNS answers for the Telegram API host so reconnecting the pooled
+# session does not wait on a fresh lookup every time.
+TELEGRAM_API_HOST = urlparse(TELEGRAM_API_URL).hostname
+DNS_CACHE_TTL = 15 * 60
+
+_dns_cache = {}
+_system_getaddrinfo = socket.getaddrinfo
+
+
+def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    if host != TELEGRAM_API_HOST:
+        return _system_getaddrinfo(host, port, family, type, proto, flags)
+
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    cached = _dns_cache.get(key)
+    if cached and now - cached[0] < DNS_CACHE_TTL:
+        return cached[1]
+
+    try:
+        addrinfo = _system_getaddrinfo(host, port, family, type, proto, flags)
+    except socket.gaierror as e:
+        if not cached:
+            raise
+        logger.warning("DNS lookup for %s failed, using cached addresses: %s", host, e)
+        return cached[1]
+    _dns_cache[key] = (now, addrinfo)
+    return addrinfo
+
+
+socket.getaddrinfo = cached_getaddrinfo
+
+# Alerts are queued per sweep and flushed as few Telegram messages as possible
+ALERT_HEADER = "🚨 IPTV Stream Alert 🚨\nThe following channels are DOWN:\n"
+ALERT_MAX_LENGTH = 4000  # Headroom under Telegram's 4096 character limit
+# Suppress repeats of the same alert for 15 minutes. This only affects sweeps
+# run more often than that (manual runs or a shorter interval); on the default
+# hourly schedule every sweep re-alerts streams that are still down.
+ALERT_DEDUP_TTL = 15 * 60
+
+_pending_alerts = []
+_recent_alerts = {}
+_alert_lock = None
+
+# Shared receive buffer; probes only need to know a datagram arrived, and all
+# reads happen on the event loop thread, so one buffer serves every socket.
+RECV_BUFFER = bytearray(65536)
+RECV_BUFFER_VIEW = memoryview(RECV_BUFFER)
+
+# imr_interface half of struct ip_mreq; packing "4sl" would add padding on
+# 64-bit platforms where long is 8 bytes.
+INADDR_ANY_BYTES = struct.pack('=I', socket.INADDR_ANY)
+
+# IP_PKTINFO reports each datagram's destination address, which tells apart
+# the multicast groups sharing one socket. socket.IP_PKTINFO is only exposed
+# by newer Pythons; 8 is the Linux value.
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8 if sys.platform.startswith('linux') else None)
+PKTINFO_ANCBUF_SIZE = socket.CMSG_SPACE(12) if IP_PKTINFO is not None else 0  # struct in_pktinfo
+
+# Sockets with multicast groups joined stay bound between sweeps so each sweep
+# skips socket setup and IGMP join latency. Sockets for unicast-only ports are
+# closed after every round, since while bound they take unicast datagrams away
+# from any other receiver on the same port. The kernel caps memberships per socket
+# (net.ipv4.igmp_max_memberships, 20 by default), so the groups on a port are
+# spread over as many sockets as needed: SOCKETS maps port -> sockets and
+# GROUPS maps socket -> groups joined on it.
+SOCKETS = {}
+GROUPS = {}
+
+# Listening window for checks that do not require data
+QUICK_CHECK_TIMEOUT = 0.2
+
 
 def send_telegram_message(message):
     try:
@@ -34,11 +130,72 @@ def send_telegram_message(message):
             'chat_id': TELEGRAM_CHAT_ID,
             'text': message
         }
-        response = requests.post(TELEGRAM_API_URL, json=payload, timeout=10)
+        response = SESSION.post(TELEGRAM_API_URL, json=payload, timeout=10)
         response.raise_for_status()
-        logger.info(f"Telegram message sent: {message}")
+        logger.info("Telegram message sent: %s", message)
+        return True
     except requests.RequestException as e:
-        logger.error(f"Failed to send Telegram message: {e}")
+        logger.error("Failed to send Telegram message: %s", e)
+        return False
+
+
+def queue_alert(name, error):
+    # _recent_alerts only records delivered alerts, so a failed send is
+    # retried on the next flush instead of being suppressed.
+    key = (name, error)
+    last_sent = _recent_alerts.get(key)
+    if last_sent is not None and time.monotonic() - last_sent < ALERT_DEDUP_TTL:
+        logger.debug("Suppressing repeated alert for %s: %s", name, error)
+        return
+    if any(queued_key == key for queued_key, _ in _pending_alerts):
+        return
+    _pending_alerts.append((key, f"- {name}: {error}"[:ALERT_MAX_LENGTH - len(ALERT_HEADER) - 1]))
+
+
+def discard_stale_alerts(current):
+    # Alerts left over from a failed send are only kept while the stream is
+    # still down with the same error
+    _pending_alerts[:] = [entry for entry in _pending_alerts if entry[0] in current]
+
+
+async def flush_alerts():
+    global _alert_lock
+    if _alert_lock is None:
+        _alert_lock = asyncio.Lock()
+
+    async with _alert_lock:
+        if not _pending_alerts:
+            return
+        entries = list(_pending_alerts)
+        _pending_alerts.clear()
+
+        # Each message is sent with the entries it carries
+        messages = []
+        message = ALERT_HEADER
+        batch = []
+        for entry in entries:
+            text = entry[1]
+            if batch and len(message) + len(text) + 1 > ALERT_MAX_LENGTH:
+                messages.append((message, batch))
+                message = ALERT_HEADER
+                batch = []
+            message += f"{text}\n"
+            batch.append(entry)
+        messages.append((message, batch))
+
+        loop = asyncio.get_running_loop()
+        delivered = set()
+        try:
+            for message, batch in messages:
+                if await loop.run_in_executor(None, send_telegram_message, message):
+                    sent_at = time.monotonic()
+                    for key, _ in batch:
+                        _recent_alerts[key] = sent_at
+                        delivered.add(key)
+        finally:
+            # Undelivered alerts, including those skipped by a cancellation, go
+            # back to the front of the queue for the next flush
+            _pending_alerts[:0] = [entry for entry in entries if entry[0] not in delivered]
 
 
 def parse_udp_url(udp_url):
@@ -54,125 +211,362 @@ def parse_udp_url(udp_url):
             raise ValueError(f"Invalid UDP URL format: {udp_url}")
         return host, port
     except Exception as e:
-        logger.error(f"Failed to parse UDP URL {udp_url}: {e}")
+        logger.error("Failed to parse UDP URL %s: %s", udp_url, e)
         return None, None
 
 
-def check_udp_stream(host, port, timeout=10, require_data=False):
-    sock = None
+def is_multicast_address(host):
+    # IPv4 multicast is 224.0.0.0/4, i.e. the top nibble of the address is 0xE
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        sock.settimeout(timeout)
-
-        is_multicast = host.startswith("224.") or host.startswith("225.") or \
-                       host.startswith("226.") or host.startswith("227.") or \
-                       host.startswith("228.") or host.startswith("229.") or \
-                       host.startswith("230.") or host.startswith("231.") or \
-                       host.startswith("232.") or host.startswith("233.") or \
-                       host.startswith("234.") or host.startswith("235.") or \
-                       host.startswith("236.") or host.startswith("237.") or \
-                       host.startswith("238.") or host.startswith("239.")
-
-        logger.debug(f"Checking {host}:{port} (Multicast: {is_multicast})")
-
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('', port))
-
-        if is_multicast:
-            import struct
-            mreq = struct.pack("4sl", socket.inet_aton(host), socket.INADDR_ANY)
-            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-            logger.debug(f"Joined multicast group {host}")
-
-        if require_data:
-            try:
-                logger.debug(f"Waiting for data from {host}:{port}")
-                data, addr = sock.recvfrom(4096)
-                if data:
-                    logger.info(f"Stream {host}:{port} is ACTIVE (received {len(data)} bytes from {addr})")
-                    return True
-            except socket.timeout:
-                logger.warning(f"Stream {host}:{port} is INACTIVE (no data received within {timeout}s)")
-                return False
-        else:
-            logger.info(f"Stream {host}:{port} is ACTIVE (binding succeeded)")
-            return True
-
-    except Exception as e:
-        logger.error(f"Error checking stream {host}:{port}: {e}")
+        addr_int = int.from_bytes(socket.inet_aton(host), 'big')
+    except OSError:
         return False
-    finally:
-        if sock:
-            sock.close()
-            logger.debug(f"Closed socket for {host}:{port}")
+    return (addr_int >> 28) == 0xE
 
 
-def check_channels(streams, timeout=10, retry_attempts=2, retry_delay=2, require_data=False):
-    results = {}
-    down_streams = []
-
+def parse_streams(streams):
+    # Stream URLs come from static config, so validate and parse them once at
+    # startup instead of on every scheduled sweep. Invalid entries keep
+    # host/port as None so they are still reported as INVALID on each check.
+    parsed_streams = []
     for stream in streams:
         name = stream.get("name")
         url = stream.get("url")
 
         if not name or not url:
-            logger.error(f"Missing name or url in stream: {stream}")
+            logger.error("Missing name or url in stream: %s", stream)
             continue
 
         host, port = parse_udp_url(url)
         if not host or not port:
-            results[name] = {'status': 'INVALID', 'error': 'Invalid URL'}
-            down_streams.append((name, 'Invalid URL'))
+            logger.warning("Stream %s (%s) has an invalid URL and will not be probed", name, url)
+            parsed_streams.append(Stream(name, url, None, None, False, None, None))
             continue
 
-        for attempt in range(retry_attempts):
-            logger.info(f"Checking {name} ({url}) - Attempt {attempt + 1}/{retry_attempts}")
-            if check_udp_stream(host, port, timeout, require_data):
-                results[name] = {'status': 'ACTIVE', 'error': None}
-                break
-            else:
-                results[name] = {'status': 'INACTIVE', 'error': 'No response or timeout'}
-                if attempt < retry_attempts - 1:
-                    logger.info(f"Retrying {name} after {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                else:
-                    down_streams.append((name, 'No response or timeout'))
+        # Pack the group address and its ip_mreq once; sweeps reuse them
+        if is_multicast_address(host):
+            group = socket.inet_aton(host)
+            parsed_streams.append(Stream(name, url, host, port, True, group, group + INADDR_ANY_BYTES))
+        else:
+            parsed_streams.append(Stream(name, url, host, port, False, None, None))
+    return tuple(parsed_streams)
 
-    if down_streams:
-        message = "🚨 IPTV Stream Alert 🚨\nThe following channels are DOWN:\n"
-        for name, error in down_streams:
-            message += f"- {name}: {error}\n"
-        send_telegram_message(message)
 
-    return results
+STREAMS = parse_streams(udp_streams)
 
 
-def scheduled_task():
+def open_udp_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if IP_PKTINFO is not None:
+            sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        sock.bind(('', port))
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def join_multicast_group(stream, sockets):
+    if any(stream.group in GROUPS[sock] for sock in sockets):
+        return
+
+    # Earlier sockets are usually at the membership limit, so try newest first
+    for sock in reversed(sockets):
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, stream.mreq)
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                raise
+            continue
+        GROUPS[sock].add(stream.group)
+        logger.debug("Joined multicast group %s", stream.host)
+        return
+
+    sock = open_udp_socket(stream.port)
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, stream.mreq)
+    except OSError:
+        sock.close()
+        raise
+    sockets.append(sock)
+    GROUPS[sock] = {stream.group}
+    logger.debug("Joined multicast group %s on additional socket %d for port %d", stream.host, len(sockets), stream.port)
+
+
+def get_udp_sockets(stream):
+    port = stream.port
+    sockets = SOCKETS.get(port)
+    if not sockets:
+        sock = open_udp_socket(port)
+        sockets = SOCKETS[port] = [sock]
+        GROUPS[sock] = set()
+
+    logger.debug("Checking %s:%d (Multicast: %s)", stream.host, port, stream.is_multicast)
+
+    if stream.is_multicast:
+        join_multicast_group(stream, sockets)
+    return sockets
+
+
+def discard_udp_sockets(port):
+    for sock in SOCKETS.pop(port, ()):
+        GROUPS.pop(sock, None)
+        sock.close()
+    logger.debug("Closed sockets for port %d", port)
+
+
+def drain_udp_socket(sock):
+    # Drop datagrams queued since the previous sweep so only fresh traffic
+    # counts as the stream being ACTIVE.
+    while True:
+        try:
+            sock.recv_into(RECV_BUFFER_VIEW)
+        except BlockingIOError:
+            return
+
+
+def close_udp_sockets():
+    for sock in GROUPS:
+        sock.close()
+    logger.debug("Closed %d sockets", len(GROUPS))
+    SOCKETS.clear()
+    GROUPS.clear()
+
+
+def packet_destination(ancdata):
+    for level, kind, data in ancdata:
+        if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+            return bytes(data[8:12])  # in_pktinfo.ipi_addr
+    return None
+
+
+async def check_udp_streams(streams, timeout=10, require_data=False):
+    # Register every port's sockets up front and wait on all of them with one
+    # shared deadline; the event loop's selector (epoll on Linux) wakes us for
+    # whichever socket delivers first. Each stream resolves to None when it is
+    # ACTIVE, otherwise to the error to report.
+    loop = asyncio.get_running_loop()
+    # Without require_data a stream only needs to show traffic within a short
+    # window, and the datagram is peeked rather than consumed.
+    flags = 0 if require_data else socket.MSG_PEEK
+    if not require_data:
+        timeout = min(timeout, QUICK_CHECK_TIMEOUT)
+    waiters = []
+    # port -> {multicast group (packed) or None for unicast: [(stream, waiter)]}
+    listeners = {}
+    # port -> sockets registered with the event loop
+    readers = {}
+
+    def stop_reading(port):
+        for sock in readers.pop(port, ()):
+            loop.remove_reader(sock)
+
+    def fail_port(port, error):
+        # Readers must be removed before discard_udp_sockets closes the sockets
+        stop_reading(port)
+        discard_udp_sockets(port)
+        for entries in listeners.pop(port, {}).values():
+            for _, waiter in entries:
+                if not waiter.done():
+                    waiter.set_result(error)
+
+    def on_readable(sock, port):
+        targets = listeners.get(port)
+        if targets is None:
+            return
+        try:
+            nbytes, ancdata, _, addr = sock.recvmsg_into([RECV_BUFFER_VIEW], PKTINFO_ANCBUF_SIZE, flags)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.error("Error checking streams on port %d: %s", port, e)
+            fail_port(port, f"{ERROR_SOCKET}: {e}")
+            return
+
+        resolved = False
+        if nbytes:
+            destination = packet_destination(ancdata)
+            if destination is None:
+                # No destination info: credit every stream on this port
+                keys = list(targets)
+            elif destination[0] >> 4 == 0xE:  # 224.0.0.0/4, compared with Stream.group
+                keys = [destination]
+            else:
+                keys = [None]
+
+            for key in keys:
+                for stream, waiter in targets.pop(key, ()):
+                    if not waiter.done():
+                        logger.info("Stream %s:%d is ACTIVE (received %d bytes from %s)", stream.host, port, nbytes, addr)
+                        waiter.set_result(None)
+                        resolved = True
+
+        if not targets:
+            stop_reading(port)
+        elif flags and not resolved:
+            # A peeked datagram stays at the head of the queue; consume it once
+            # it has nothing left to tell us so the next one can be seen.
+            try:
+                sock.recv_into(RECV_BUFFER_VIEW)
+            except OSError:
+                pass
+
+    try:
+        for stream in streams:
+            host, port = stream.host, stream.port
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            try:
+                sockets = get_udp_sockets(stream)
+            except Exception as e:
+                logger.error("Failed to set up stream %s:%d: %s", host, port, e)
+                waiter.set_result(f"{ERROR_SETUP_FAILED}: {e}")
+                continue
+
+            # A join may have opened another socket for a port already being read
+            registered = readers.setdefault(port, [])
+            listeners.setdefault(port, {})
+            try:
+                for sock in sockets:
+                    if sock not in registered:
+                        drain_udp_socket(sock)
+                        loop.add_reader(sock, on_readable, sock, port)
+                        registered.append(sock)
+            except OSError as e:
+                logger.error("Failed to set up stream %s:%d: %s", host, port, e)
+                fail_port(port, f"{ERROR_SETUP_FAILED}: {e}")
+                waiter.set_result(f"{ERROR_SETUP_FAILED}: {e}")
+                continue
+
+            logger.debug("Waiting for data from %s:%d", host, port)
+            listeners[port].setdefault(stream.group, []).append((stream, waiter))
+
+        pending = [waiter for waiter in waiters if not waiter.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+
+        results = []
+        for stream, waiter in zip(streams, waiters):
+            if waiter.done():
+                results.append(waiter.result())
+            else:
+                logger.warning("Stream %s:%d is INACTIVE (no data received within %ss)", stream.host, stream.port, timeout)
+                waiter.cancel()
+                results.append(ERROR_NO_RESPONSE)
+        return results
+    finally:
+        for port in list(readers):
+            stop_reading(port)
+        for port in listeners:
+            if not any(GROUPS.get(sock) for sock in SOCKETS.get(port, ())):
+                discard_udp_sockets(port)
+
+
+async def check_channels(streams, timeout=10, retry_attempts=2, retry_delay=2, require_data=False):
+    # Results are parallel lists indexed like streams
+    statuses = [STATUS_INACTIVE] * len(streams)
+    errors = [ERROR_NO_RESPONSE] * len(streams)
+    pending = []
+
+    for index, stream in enumerate(streams):
+        if not stream.host or not stream.port:
+            statuses[index] = STATUS_INVALID
+            errors[index] = ERROR_INVALID_URL
+            continue
+        pending.append(index)
+
+    # Each attempt probes every still-inactive stream in one batch
+    for attempt in range(retry_attempts):
+        if not pending:
+            break
+        for index in pending:
+            stream = streams[index]
+            logger.info("Checking %s (%s) - Attempt %d/%d", stream.name, stream.url, attempt + 1, retry_attempts)
+
+        failures = await check_udp_streams([streams[index] for index in pending], timeout, require_data)
+        for index, error in zip(pending, failures):
+            if error is None:
+                statuses[index] = STATUS_ACTIVE
+            errors[index] = error
+        pending = [index for index, error in zip(pending, failures) if error is not None]
+
+        if pending and attempt < retry_attempts - 1:
+            logger.info("Retrying %d streams after %s seconds...", len(pending), retry_delay)
+            await asyncio.sleep(retry_delay)
+
+    # Flush every sweep so alerts from an earlier failed send do not wait for
+    # the next outage
+    down = [(stream.name, error) for stream, status, error in zip(streams, statuses, errors) if status != STATUS_ACTIVE]
+    discard_stale_alerts(set(down))
+    for name, error in down:
+        queue_alert(name, error)
+    await flush_alerts()
+
+    return statuses, errors
+
+
+async def scheduled_task():
     logger.info("Starting scheduled UDP stream check...")
-    results = check_channels(udp_streams, timeout=10, retry_attempts=2, retry_delay=2, require_data=True)
+    statuses, errors = await check_channels(STREAMS, timeout=10, retry_attempts=2, retry_delay=2, require_data=True)
+
+    if not logger.isEnabledFor(logging.INFO):
+        return
 
     logger.info("\nChannel Status Report:")
     logger.info("-" * 50)
-    for name, info in results.items():
-        status = info['status']
-        error = info['error'] if info['error'] else 'None'
-        logger.info(f"Channel: {name}\nStatus: {status}\nError: {error}\n")
+    for stream, status, error in zip(STREAMS, statuses, errors):
+        logger.info("Channel: %s\nStatus: %s\nError: %s\n", stream.name, STATUS_NAMES[status], error or 'None')
 
 
-def main():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(scheduled_task, 'interval', hours=1)
+async def run_scheduler():
+    loop = asyncio.get_running_loop()
+
+    # Block until SIGINT/SIGTERM instead of waking up periodically; installed
+    # before the first sweep so a signal during it still shuts down cleanly.
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # Sweeps still in flight at shutdown are cancelled and awaited so their
+    # sockets are unregistered from the event loop before being closed.
+    sweeps = set()
+
+    async def run_sweep():
+        sweep = asyncio.current_task()
+        sweeps.add(sweep)
+        try:
+            await scheduled_task()
+        finally:
+            sweeps.discard(sweep)
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(run_sweep, 'interval', hours=1)
 
     logger.info("Starting scheduler and running first check immediately...")
-    scheduled_task()  # Run immediately on startup
     scheduler.start()
+    loop.create_task(run_sweep())  # Run immediately on startup
 
     try:
-        while True:
-            time.sleep(1)
-    except (KeyboardInterrupt, SystemExit):
+        await stop.wait()
+    finally:
         logger.info("Shutting down scheduler...")
-        scheduler.shutdown()
+        scheduler.shutdown(wait=False)
+        running = list(sweeps)
+        for sweep in running:
+            sweep.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        close_udp_sockets()
+        SESSION.close()
+
+
+def main():
+    try:
+        asyncio.run(run_scheduler())
+    except (KeyboardInterrupt, SystemExit):
+        pass
 
 
 if __name__ == "__main__":